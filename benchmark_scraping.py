@@ -0,0 +1,117 @@
+import os
+import glob
+import json
+import time
+import argparse
+import requests
+# functionalities builds the Spotify client on import. Constructing it needs credentials but no network access, so
+# placeholders keep the benchmark runnable on a clean checkout.
+os.environ.setdefault('SPOTIPY_CLIENT_ID', 'benchmark')
+os.environ.setdefault('SPOTIPY_CLIENT_SECRET', 'benchmark')
+from functionalities import (load_links_from_json, parse_bandcamp_track_info, parse_bandcamp_head,
+                             parse_soundcloud_track_info, parse_soundcloud_head, parse_soundcloud_oembed,
+                             extract_track_info_fast, HEAD_CHUNK_SIZE, SCRAPE_TIMEOUT)
+
+# Compares bytes read and parse time of the full-DOM scrapers with the head-only (--fast_scrape) extraction on
+# recorded pages. Record pages once with --record_from, the benchmark itself runs offline. ./benchmark_pages holds a few
+# small synthetic pages with the providers' head/meta layout for a quick, reproducible run.
+# "read KB" is what the fast path consumes from the (decoded) stream in HEAD_CHUNK_SIZE chunks, "</head> KB" is where
+# the head actually ends. On the wire both are lower with compression and TCP buffering can add a bit.
+parser = argparse.ArgumentParser(description='Benchmark full-page vs. head-only metadata extraction')
+parser.add_argument('--pages_dir', default='./recorded_pages', type=str, help='Directory with recorded pages')
+parser.add_argument('--record_from', default='', type=str, help='categorized_links.json to record pages from')
+parser.add_argument('--max_pages', default=20, type=int, help='Max pages to record per provider')
+parser.add_argument('--repeat', default=5, type=int, help='Parse repetitions per page')
+
+PROVIDERS = {
+    'bandcamp': (parse_bandcamp_track_info, parse_bandcamp_head, None),
+    'soundcloud': (parse_soundcloud_track_info, parse_soundcloud_head, parse_soundcloud_oembed),
+}
+
+def record_pages(json_file_path, pages_dir, max_pages):
+    os.makedirs(pages_dir, exist_ok=True)
+    for provider in PROVIDERS:
+        links = [link for link in load_links_from_json(json_file_path, category=provider)
+                 if provider != 'bandcamp' or '/track/' in link][:max_pages]
+        for i, link in enumerate(links):
+            try:
+                response = requests.get(link, timeout=SCRAPE_TIMEOUT)
+            except requests.RequestException:
+                continue
+            if response.status_code != 200:
+                continue
+            with open(os.path.join(pages_dir, f'{provider}_{i:03d}.html'), 'wb') as f:
+                f.write(response.content)
+            if provider == 'soundcloud':
+                try:
+                    oembed = requests.get('https://soundcloud.com/oembed', params={'format': 'json', 'url': link},
+                                          timeout=SCRAPE_TIMEOUT)
+                except requests.RequestException:
+                    continue
+                if oembed.status_code == 200:
+                    with open(os.path.join(pages_dir, f'{provider}_{i:03d}.oembed.json'), 'wb') as f:
+                        f.write(oembed.content)
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeat
+
+def benchmark_page(page_path, parse_html, parse_head, parse_oembed, repeat):
+    with open(page_path, 'rb') as f:
+        page = f.read()
+    chunks = [page[i:i + HEAD_CHUNK_SIZE] for i in range(0, len(page), HEAD_CHUNK_SIZE)]
+    bytes_read = [0]
+
+    def fast():
+        bytes_read[0] = 0
+        def counted():
+            for chunk in chunks:
+                bytes_read[0] += len(chunk)
+                yield chunk
+        return extract_track_info_fast(counted(), 'utf-8', parse_html, parse_head)
+
+    full_result, full_time = timed(lambda: parse_html(page.decode('utf-8', errors='replace')), repeat)
+    fast_result, fast_time = timed(fast, repeat)
+    head_end = page.lower().find(b'</head')
+    stats = {'full_bytes': len(page), 'fast_bytes': bytes_read[0],
+             'head_bytes': head_end if head_end >= 0 else len(page),
+             'full_time': full_time, 'fast_time': fast_time, 'match': full_result == fast_result,
+             'oembed_bytes': None, 'oembed_match': None}
+    oembed_path = os.path.splitext(page_path)[0] + '.oembed.json'
+    if parse_oembed and os.path.isfile(oembed_path):
+        with open(oembed_path, 'rb') as f:
+            oembed = f.read()
+        stats['oembed_bytes'] = len(oembed)
+        stats['oembed_match'] = parse_oembed(json.loads(oembed)) == full_result
+    return stats
+
+def main():
+    args = parser.parse_args()
+    if args.record_from:
+        record_pages(args.record_from, args.pages_dir, args.max_pages)
+
+    print(f"{'provider':<12}{'pages':>6}{'full KB':>10}{'read KB':>10}{'</head> KB':>12}{'oEmbed KB':>11}"
+          f"{'full ms':>10}{'head ms':>10}{'same result':>13}")
+    for provider, (parse_html, parse_head, parse_oembed) in PROVIDERS.items():
+        page_paths = sorted(glob.glob(os.path.join(args.pages_dir, f'{provider}_*.html')))
+        if not page_paths:
+            continue
+        stats = [benchmark_page(path, parse_html, parse_head, parse_oembed, args.repeat) for path in page_paths]
+        oembed_stats = [s for s in stats if s['oembed_bytes'] is not None]
+        oembed_kb = f"{sum(s['oembed_bytes'] for s in oembed_stats) / 1024:.1f}" if oembed_stats else '-'
+        same = sum(s['match'] for s in stats)
+        if oembed_stats:
+            same = f"{same}/{len(stats)} ({sum(s['oembed_match'] for s in oembed_stats)} oE)"
+        else:
+            same = f"{same}/{len(stats)}"
+        print(f"{provider:<12}{len(stats):>6}"
+              f"{sum(s['full_bytes'] for s in stats) / 1024:>10.1f}{sum(s['fast_bytes'] for s in stats) / 1024:>10.1f}"
+              f"{sum(s['head_bytes'] for s in stats) / 1024:>12.1f}"
+              f"{oembed_kb:>11}"
+              f"{sum(s['full_time'] for s in stats) * 1000:>10.1f}{sum(s['fast_time'] for s in stats) * 1000:>10.1f}"
+              f"{same:>13}")
+
+if __name__ == '__main__':
+    main()
@@ -9,9 +9,82 @@ import unicodedata
 import numpy as np
 import requests
 import csv
+import time
+import cProfile
+import pstats
+from contextlib import contextmanager
 from datetime import datetime
+from html.parser import HTMLParser
+from urllib.parse import urlsplit, urlunsplit
 from spotify_client import sp
 
+################################################ Tracing  ##############################################################
+# --profile records one span per link and per stage (scrape, Shazam lookup, Spotify search, similarity scoring,
+# playlist write) and exports them as Chrome trace JSON (chrome://tracing, ui.perfetto.dev).
+TRACE = {'enabled': False, 'events': [], 'stack': [], 't0': 0}
+
+def enable_tracing():
+    TRACE['enabled'] = True
+    TRACE['events'] = []
+    TRACE['stack'] = []
+    TRACE['t0'] = time.perf_counter_ns()
+
+@contextmanager
+def trace_span(name, cat='stage', **attrs):
+    if not TRACE['enabled']:
+        yield attrs
+        return
+    TRACE['stack'].append(attrs)
+    start = time.perf_counter_ns()
+    try:
+        yield attrs
+    finally:
+        end = time.perf_counter_ns()
+        TRACE['stack'].pop()
+        TRACE['events'].append({'name': name, 'cat': cat, 'ph': 'X', 'pid': os.getpid(), 'tid': 1,
+                                'ts': (start - TRACE['t0']) / 1000, 'dur': (end - start) / 1000, 'args': attrs})
+
+def trace_annotate(**attrs):
+    # Adds attributes (e.g. cache hits) to the innermost open span
+    if TRACE['enabled'] and TRACE['stack']:
+        TRACE['stack'][-1].update(attrs)
+
+def export_trace(trace_path):
+    with open(trace_path, 'w', encoding='utf-8') as json_file:
+        json.dump({'traceEvents': TRACE['events'], 'displayTimeUnit': 'ms'}, json_file, default=str)
+    print(f"Wrote {len(TRACE['events'])} trace events to '{trace_path}'.")
+
+def print_slowest_links(top_n=10):
+    links = sorted([e for e in TRACE['events'] if e['cat'] == 'link'], key=lambda e: e['dur'], reverse=True)
+    stages = [e for e in TRACE['events'] if e['cat'] != 'link']
+    print(f"~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~")
+    print(f"Top {min(top_n, len(links))} slowest of {len(links)} links:")
+    for link in links[:top_n]:
+        breakdown = {}  # stage name -> (count, total ms) within this link
+        for stage in stages:
+            if link['ts'] <= stage['ts'] and stage['ts'] + stage['dur'] <= link['ts'] + link['dur']:
+                count, total = breakdown.get(stage['name'], (0, 0.0))
+                breakdown[stage['name']] = (count + 1, total + stage['dur'] / 1000)
+        stage_info = ", ".join(f"{name} x{count} {total:.0f} ms" for name, (count, total) in
+                               sorted(breakdown.items(), key=lambda x: x[1][1], reverse=True))
+        print(f"{link['dur'] / 1000:9.0f} ms  {link['args'].get('provider', '')}  {link['args'].get('url', '')}")
+        if stage_info:
+            print(f"             ({stage_info})")
+    print(f"~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~")
+
+def start_cpu_profile():
+    profiler = cProfile.Profile(time.process_time)  # CPU time, network waits don't show up
+    profiler.enable()
+    return profiler
+
+def stop_cpu_profile(profiler, profile_path, top_n=25):
+    profiler.disable()
+    profiler.dump_stats(profile_path)
+    pstats.Stats(profiler).sort_stats('cumulative').print_stats(top_n)
+    print(f"Wrote CPU profile to '{profile_path}' (inspect with e.g. snakeviz or pstats).")
+########################################################################################################################
+
+
 ######################################### General helpers  #############################################################
 def load_links_from_json(json_file_path,  category):
     with open(json_file_path, 'r', encoding='utf-8') as json_file:
@@ -65,6 +138,7 @@ def delete_all_playlist_tracks(sp, playlist_id):
         if results['next'] is None:  # If there are no more pages
             break
         offset = 0
+    DUPLICATE_INDEX['playlists'].pop(playlist_id, None)
     remaining_tracks = sp.playlist_tracks(playlist_id, limit=1)
     if not remaining_tracks['items']:
         print("All tracks removed successfully.")
@@ -72,10 +146,17 @@ def delete_all_playlist_tracks(sp, playlist_id):
         print(f"{len(remaining_tracks['items'])} tracks remain in the playlist.")
 
 
-def add_tracks_to_playlist(sp, playlist_id, track_ids, testrun=False):
-    existing_track_ids = get_all_playlist_tracks(sp, playlist_id)
+def add_tracks_to_playlist(sp, playlist_id, track_ids, testrun=False, skip_near_duplicates=False):
+    existing_track_ids = get_indexed_playlist_tracks(sp, playlist_id)
+    existing_track_id_set = set(existing_track_ids)
     # Filter track IDs that are already in pl
-    new_tracks = [track_id for track_id in track_ids if track_id not in existing_track_ids]
+    new_tracks = [track_id for track_id in track_ids if track_id not in existing_track_id_set]
+    if skip_near_duplicates:  # Filter the same recording under a different ID (single, EP, compilation)
+        new_tracks, near_duplicates = filter_near_duplicates(sp, new_tracks, existing_track_ids)
+        if near_duplicates:
+            print(f"Skipped {len(near_duplicates)} near-duplicate tracks (same ISRC or artist/title):")
+            for track_id in near_duplicates:
+                print(f"    {DUPLICATE_INDEX['tracks'].get(track_id, {}).get('key', track_id)}")
     if new_tracks:
         if testrun:
             print("+++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++")
@@ -88,7 +169,9 @@ def add_tracks_to_playlist(sp, playlist_id, track_ids, testrun=False):
             batch_size = 100
             for i in range(0, len(new_tracks), batch_size):
                 batch = new_tracks[i:i + batch_size]
-                sp.playlist_add_items(playlist_id, batch)
+                with trace_span('playlist_write', playlist_id=playlist_id, tracks=len(batch)):
+                    snapshot = sp.playlist_add_items(playlist_id, batch)
+                record_added_tracks(playlist_id, batch, snapshot['snapshot_id'])
                 print("+++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++")
                 print(f"Added {len(batch)} new tracks to the playlist.")
                 print("+++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++")
@@ -96,34 +179,27 @@ def add_tracks_to_playlist(sp, playlist_id, track_ids, testrun=False):
         print("+++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++")
         print("No new tracks to add; all tracks are already in the playlist.")
         print("+++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++")
+    save_duplicate_index()
 
 def collect_all_tracks_from_playlists(sp, user_id, playlist_names):
     all_track_ids = []
     for playlist_name in playlist_names:
         playlist_id = create_or_get_playlist(sp, user_id, playlist_name)
-        offset = 0
-        while True:
-            results = sp.playlist_tracks(playlist_id, offset=offset, limit=100) # Fetch tracks in batches of 100
-            tracks = results['items']
-            if not tracks:
-                break  # If no more tracks returned exit loop
-            for track in tracks:
-                track_id = track['track']['id']
-                if track_id:
-                    all_track_ids.append(track_id)
-            offset += 100  # Increase the offset to get next batch
+        all_track_ids.extend([track_id for track_id in get_indexed_playlist_tracks(sp, playlist_id) if track_id])
+    save_duplicate_index()
     return all_track_ids
 
 def check_for_duplicates_in_playlist(sp, playlist_id):
-    existing_tracks = get_all_playlist_tracks(sp, playlist_id)
-    track_counts = {}
+    existing_tracks = [track_id for track_id in get_indexed_playlist_tracks(sp, playlist_id) if track_id]
+    index_track_metadata(sp, existing_tracks)
+    seen_keys = set()
     duplicates = []
-    for track_id in existing_tracks:
-        if track_id in track_counts:
-            track_counts[track_id] += 1
+    for track_id in existing_tracks:  # same ID, same ISRC or same normalized artist/title
+        keys = duplicate_keys(track_id)
+        if keys & seen_keys:
             duplicates.append(track_id)
-        else:
-            track_counts[track_id] = 1
+        seen_keys.update(keys)
+    save_duplicate_index()
     if duplicates:
         print(f"Found {len(duplicates)} duplicate tracks in the playlist.")
         return duplicates
@@ -133,6 +209,108 @@ def check_for_duplicates_in_playlist(sp, playlist_id):
 ########################################################################################################################
 
 
+############################################# Duplicate index  #########################################################
+# Persistent ISRC and normalized artist/title keys per track ID plus the track IDs of every playlist we touched.
+# A playlist's cached track list is reused as long as its snapshot_id is unchanged, so merges and duplicate checks
+# don't need to re-scan whole playlists.
+DUPLICATE_INDEX_VERSION = 2  # bump when the artist/title key changes, stored track keys are rebuilt
+DUPLICATE_INDEX = {'path': '', 'tracks': {}, 'playlists': {}}
+
+def load_duplicate_index(index_path):
+    DUPLICATE_INDEX['path'] = index_path
+    DUPLICATE_INDEX['tracks'] = {}
+    DUPLICATE_INDEX['playlists'] = {}
+    if index_path and os.path.isfile(index_path):
+        try:  # the index is only an optimisation, a broken file must never stop a run
+            with open(index_path, 'r', encoding='utf-8') as json_file:
+                index = json.load(json_file)
+            if not isinstance(index, dict):
+                raise ValueError("not a JSON object")
+        except (ValueError, OSError) as e:
+            print(f"Ignoring unreadable duplicate index '{index_path}' ({e}), starting with an empty index.")
+            return
+        if index.get('version') == DUPLICATE_INDEX_VERSION:
+            DUPLICATE_INDEX['tracks'] = index.get('tracks', {})
+        DUPLICATE_INDEX['playlists'] = index.get('playlists', {})
+
+def save_duplicate_index():
+    if not DUPLICATE_INDEX['path']:
+        return
+    tmp_path = DUPLICATE_INDEX['path'] + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as json_file:
+        json.dump({'version': DUPLICATE_INDEX_VERSION, 'tracks': DUPLICATE_INDEX['tracks'],
+                   'playlists': DUPLICATE_INDEX['playlists']}, json_file)
+    os.replace(tmp_path, DUPLICATE_INDEX['path'])
+
+def normalize_duplicate_text(text):
+    # Stricter than clean_string: only case, accents, "feat." credits and remaster notes are dropped, every other
+    # qualifier ((Dub), (VIP), (Instrumental), (Live at ...), (Acoustic), ...) marks a different recording
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r'\s*[(\[][^)\]]*\b(feat\.?|ft\.|featuring)\s[^)\]]*[)\]]', '', text)  # (feat. X), [ft. X]
+    text = re.sub(r'\s+(feat\.?|ft\.|featuring)\s.*$', '', text)  # trailing feat. X
+    text = re.sub(r'\s*[(\[][^)\]]*\bremaster(ed)?\b[^)\]]*[)\]]', '', text)  # (2011 Remaster), [Remastered]
+    text = re.sub(r'\s+-\s+[^-]*\bremaster(ed)?\b[^-]*$', '', text)  # - Remastered 2011
+    return " ".join(text.split())
+
+def normalize_track_key(track):
+    artists = " ".join(sorted(normalize_duplicate_text(artist['name']) for artist in track['artists']))
+    return f"{artists} - {normalize_duplicate_text(track['name'])}"
+
+def index_track_metadata(sp, track_ids):
+    missing = [track_id for track_id in dict.fromkeys(track_ids) if track_id not in DUPLICATE_INDEX['tracks']]
+    for i in range(0, len(missing), 50):  # Spotify API allows max 50 IDs per request
+        with trace_span('spotify_tracks', tracks=len(missing[i:i + 50])):
+            tracks = sp.tracks(missing[i:i + 50])['tracks']
+        for track in tracks:
+            if track:
+                DUPLICATE_INDEX['tracks'][track['id']] = {'isrc': track.get('external_ids', {}).get('isrc'),
+                                                          'key': normalize_track_key(track)}
+
+def duplicate_keys(track_id):
+    entry = DUPLICATE_INDEX['tracks'].get(track_id, {})
+    keys = {f"id:{track_id}"}
+    if entry.get('isrc'):
+        keys.add(f"isrc:{entry['isrc'].upper()}")
+    if entry.get('key'):
+        keys.add(f"key:{entry['key']}")
+    return keys
+
+def get_indexed_playlist_tracks(sp, playlist_id):
+    with trace_span('playlist_read', playlist_id=playlist_id):
+        snapshot_id = sp.playlist(playlist_id, fields='snapshot_id')['snapshot_id']
+        cached = DUPLICATE_INDEX['playlists'].get(playlist_id)
+        if cached and cached['snapshot_id'] == snapshot_id:
+            trace_annotate(cache_hit=True)
+            return list(cached['track_ids'])
+        trace_annotate(cache_hit=False)
+        track_ids = get_all_playlist_tracks(sp, playlist_id)  # changed outside of this tool or never seen, full scan
+        DUPLICATE_INDEX['playlists'][playlist_id] = {'snapshot_id': snapshot_id, 'track_ids': track_ids}
+        return list(track_ids)
+
+def record_added_tracks(playlist_id, track_ids, snapshot_id):
+    cached = DUPLICATE_INDEX['playlists'].setdefault(playlist_id, {'snapshot_id': None, 'track_ids': []})
+    cached['track_ids'].extend(track_ids)
+    cached['snapshot_id'] = snapshot_id
+
+def filter_near_duplicates(sp, track_ids, existing_track_ids):
+    existing_track_ids = [track_id for track_id in existing_track_ids if track_id]
+    index_track_metadata(sp, existing_track_ids + track_ids)
+    seen_keys = set()
+    for track_id in existing_track_ids:
+        seen_keys.update(duplicate_keys(track_id))
+    kept, skipped = [], []
+    for track_id in track_ids:
+        keys = duplicate_keys(track_id)
+        if keys & seen_keys:
+            skipped.append(track_id)
+        else:
+            kept.append(track_id)
+            seen_keys.update(keys)
+    return kept, skipped
+########################################################################################################################
+
+
 ######################  Link extraction and clustering from Telegram chat export #######################################
 def extract_links_from_html(file_path):
     with open(file_path, 'r', encoding='utf-8') as file:
@@ -189,6 +367,190 @@ def process_html_files(file_paths):
 ########################################################################################################################
 
 
+########################################## Scrape metadata cache  ######################################################
+# Scraped (title, artist) pairs keyed by canonical URL. Entries older than max_age are revalidated with conditional
+# GETs (ETag / Last-Modified), dead links (404/410) and pages without parsable metadata are stored as negative entries
+# with exponential backoff.
+SCRAPE_TIMEOUT = 15  # seconds
+NEGATIVE_BACKOFF_BASE = 24 * 3600  # retry a dead link after 1 day, then 2, 4, ... days
+NEGATIVE_BACKOFF_MAX = 30 * 24 * 3600
+SCRAPE_CACHE = {'path': '', 'max_age': 7 * 24 * 3600, 'entries': {}}
+
+def load_scrape_cache(cache_path, max_age_hours=168):
+    SCRAPE_CACHE['path'] = cache_path
+    SCRAPE_CACHE['max_age'] = max_age_hours * 3600
+    SCRAPE_CACHE['entries'] = {}
+    if cache_path and os.path.isfile(cache_path):
+        try:  # the cache is only an optimisation, a broken file must never stop a run
+            with open(cache_path, 'r', encoding='utf-8') as json_file:
+                entries = json.load(json_file)
+            if not isinstance(entries, dict):
+                raise ValueError("not a JSON object")
+            SCRAPE_CACHE['entries'] = entries
+        except (ValueError, OSError) as e:
+            print(f"Ignoring unreadable scrape cache '{cache_path}' ({e}), starting with an empty cache.")
+
+def save_scrape_cache():
+    if not SCRAPE_CACHE['path']:
+        return
+    tmp_path = SCRAPE_CACHE['path'] + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as json_file:
+        json.dump(SCRAPE_CACHE['entries'], json_file, indent=1)
+    os.replace(tmp_path, SCRAPE_CACHE['path'])  # never leave a half-written cache behind
+
+def canonicalize_url(link):
+    # Drop tracking queries (?si=..., ?utm_source=...), fragments and trailing slashes
+    parts = urlsplit(link.strip())
+    netloc = parts.netloc.lower()
+    if netloc.startswith('www.') or netloc.startswith('m.'):
+        netloc = netloc.split('.', 1)[1]
+    return urlunsplit(('https', netloc, parts.path.rstrip('/'), '', ''))
+
+def fetch_cached_track_info(link, parse_html, parse_head=None, oembed=None, fast=False):
+    with trace_span('scrape', url=link, fast=fast) as span:
+        title, artist = fetch_track_info_with_cache(link, parse_html, parse_head, oembed, fast)
+        span['found'] = bool(title or artist)
+    return title, artist
+
+def fetch_track_info_with_cache(link, parse_html, parse_head=None, oembed=None, fast=False):
+    key = canonicalize_url(link)
+    entry = SCRAPE_CACHE['entries'].get(key)
+    now = time.time()
+    cached = (entry['title'], entry['artist']) if entry and entry['status'] == 200 else (None, None)
+    validators = None
+    if entry:
+        if entry['status'] != 200:
+            if now < entry['retry_after']:  # known dead link, still backing off
+                trace_annotate(cache='negative')
+                return None, None
+        elif now - entry['checked_at'] < SCRAPE_CACHE['max_age']:  # fresh, no request at all
+            trace_annotate(cache='fresh')
+            return cached
+        else:
+            validators = entry  # stale, revalidate with a conditional request
+    try:
+        response, result, source = request_track_info(link, validators, parse_html, parse_head, oembed, fast)
+    except requests.RequestException as e:
+        trace_annotate(cache='error', error=type(e).__name__)
+        return cached  # transient network problem, keep whatever we know
+    trace_annotate(cache='revalidated' if validators else 'miss', status=response.status_code, source=source)
+    if response.status_code == 304 and entry and entry['status'] == 200:  # unchanged, no body to parse
+        entry['checked_at'] = now
+        return cached
+    if response.status_code in (404, 410):
+        store_negative_entry(key, entry, response.status_code, now)
+        return None, None
+    if response.status_code != 200:
+        return cached
+    title, artist = result
+    if title is None and artist is None:  # consent/captcha page or changed layout, retry with backoff
+        store_negative_entry(key, entry, 'unparsed', now)
+        return None, None
+    SCRAPE_CACHE['entries'][key] = {'status': 200, 'title': title, 'artist': artist, 'checked_at': now,
+                                    'etag': response.headers.get('ETag'),
+                                    'last_modified': response.headers.get('Last-Modified'), 'validators_for': source}
+    return title, artist
+
+def store_negative_entry(key, entry, status, now):
+    failures = entry['failures'] + 1 if entry and entry['status'] != 200 else 1
+    backoff = min(NEGATIVE_BACKOFF_BASE * 2 ** (failures - 1), NEGATIVE_BACKOFF_MAX)
+    SCRAPE_CACHE['entries'][key] = {'status': status, 'failures': failures, 'checked_at': now,
+                                    'retry_after': now + backoff}
+
+def conditional_headers(validators, source):
+    # ETag/Last-Modified are only meaningful for the resource ('page' or 'oembed') that sent them
+    headers = {}
+    if validators and validators.get('validators_for', 'page') == source:
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+    return headers
+
+def request_track_info(link, validators, parse_html, parse_head=None, oembed=None, fast=False):
+    # Returns the response (for status and validators), the parsed (title, artist) if the status is 200 and the
+    # resource the response came from
+    if fast and oembed:  # compact JSON endpoint, a few hundred bytes instead of the whole page
+        endpoint, parse_oembed = oembed
+        response = requests.get(endpoint, params={'format': 'json', 'url': link},
+                                headers=conditional_headers(validators, 'oembed'), timeout=SCRAPE_TIMEOUT)
+        if response.status_code == 304:
+            return response, None, 'oembed'
+        # 404/410 only means oEmbed can't resolve the URL (e.g. share links), the page itself decides if it is dead
+        if response.status_code == 200:
+            try:
+                result = parse_oembed(response.json())
+            except ValueError:
+                result = None
+            if result:
+                return response, result, 'oembed'
+    headers = conditional_headers(validators, 'page')
+    if fast and parse_head:
+        with requests.get(link, headers=headers, timeout=SCRAPE_TIMEOUT, stream=True) as response:
+            if response.status_code != 200:
+                return response, None, 'page'
+            chunks = response.iter_content(HEAD_CHUNK_SIZE)
+            result = extract_track_info_fast(chunks, response.encoding or 'utf-8', parse_html, parse_head)
+            return response, result, 'page'
+    response = requests.get(link, headers=headers, timeout=SCRAPE_TIMEOUT)
+    return response, parse_html(response.text) if response.status_code == 200 else None, 'page'
+########################################################################################################################
+
+
+####################################### Head-only metadata extraction  #################################################
+# Reads a page only up to </head> and scans its <meta>/<title> tags without building a DOM. Provider-specific
+# parse_head functions return None if fields are missing, in which case the rest of the page is read and handed to
+# the full BeautifulSoup parser.
+HEAD_CHUNK_SIZE = 16 * 1024
+
+class HeadMetaScanner(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.meta = {}  # ('property', 'og:title') / ('name', 'title') -> content, 'title' -> <title> text
+        self.in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'meta':
+            attrs = dict(attrs)
+            for attr in ('property', 'name'):
+                if attrs.get(attr) and attrs.get('content') is not None:
+                    self.meta.setdefault((attr, attrs[attr]), attrs['content'])  # first match wins, like soup.find
+        elif tag == 'title' and 'title' not in self.meta:
+            self.in_title = True
+            self.meta['title'] = ''
+
+    def handle_endtag(self, tag):
+        if tag == 'title':
+            self.in_title = False
+
+    def handle_data(self, data):
+        if self.in_title:
+            self.meta['title'] += data
+
+def read_until_head_end(chunks):
+    head = b''
+    for chunk in chunks:
+        start = max(len(head) - len(b'</head'), 0)  # the closing tag may straddle two chunks
+        head += chunk
+        if b'</head' in head[start:].lower():
+            break
+    return head
+
+def scan_head_meta(head_html):
+    scanner = HeadMetaScanner()
+    scanner.feed(head_html)
+    return scanner.meta
+
+def extract_track_info_fast(chunks, encoding, parse_html, parse_head):
+    chunks = iter(chunks)
+    head = read_until_head_end(chunks)
+    result = parse_head(scan_head_meta(head.decode(encoding, errors='replace')))
+    if result:
+        return result
+    return parse_html((head + b''.join(chunks)).decode(encoding, errors='replace'))  # read the rest, full DOM
+########################################################################################################################
+
+
 ######################################### Provider-specific routines  ###################################################
 
 ### Spotify
@@ -224,7 +586,8 @@ def get_video_titles_from_youtube(video_ids):
     clean_video_ids = [clean_video_id(vid) for vid in video_ids]
     for i in range(0, len(clean_video_ids), 50):  # YouTube API allows max 50 IDs per request
         request = youtube.videos().list(part='snippet', id=','.join(clean_video_ids[i:i + 50]))
-        response = request.execute()
+        with trace_span('youtube_titles', videos=len(clean_video_ids[i:i + 50])):
+            response = request.execute()
         for item in response.get('items', []):
             video_id = item['id']
             title = item['snippet']['title']
@@ -252,51 +615,67 @@ async def get_shazam_track_info(track_id):
 async def process_shazam_links(shazam_links, verbose=False):
     track_ids = []
     for shazam_link in shazam_links:
-        shid = extract_shazam_ids(shazam_link)
-        title, artist = await get_shazam_track_info(shid)  # Await the track info
-        spotify_track_id = search_spotify_track(sp, query_title=title, query_artist=artist, min_similarity=0.7,
-                                                verbose=verbose)
-        if spotify_track_id:
-            track_ids.append(spotify_track_id)
+        with trace_span('link', cat='link', provider='shazam', url=shazam_link):
+            shid = extract_shazam_ids(shazam_link)
+            with trace_span('shazam_lookup', shazam_id=shid):
+                title, artist = await get_shazam_track_info(shid)  # Await the track info
+            spotify_track_id = search_spotify_track(sp, query_title=title, query_artist=artist, min_similarity=0.7,
+                                                    verbose=verbose)
+            if spotify_track_id:
+                track_ids.append(spotify_track_id)
     return track_ids
 
 ### Bandcamp
-def scrape_bandcamp_track_info(link):
-    response = requests.get(link)
-    if response.status_code == 200:
-        try:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            track_title = soup.find('meta', {'property': 'og:title'})['content']
-            artist = soup.find('meta', {'name': 'title'})['content'].split(', by ')[-1]
-            if ", by" in track_title and artist in track_title:
-                track_title = track_title.split(", by")[0]
-            if "remix" in track_title.lower() or "edit" in track_title.lower():
-                return track_title, None
-            else:
-                return track_title, artist
-        except:
-            return None, None
-    return None, None
+def bandcamp_track_info_from_meta(track_title, page_title):
+    artist = page_title.split(', by ')[-1]
+    if ", by" in track_title and artist in track_title:
+        track_title = track_title.split(", by")[0]
+    if "remix" in track_title.lower() or "edit" in track_title.lower():
+        return track_title, None
+    else:
+        return track_title, artist
 
-def process_bandcamp_links(links, verbose=False):
+def parse_bandcamp_track_info(html):
+    try:
+        soup = BeautifulSoup(html, 'html.parser')
+        track_title = soup.find('meta', {'property': 'og:title'})['content']
+        page_title = soup.find('meta', {'name': 'title'})['content']
+        return bandcamp_track_info_from_meta(track_title, page_title)
+    except:
+        return None, None
+
+def parse_bandcamp_head(meta):
+    track_title = meta.get(('property', 'og:title'))
+    page_title = meta.get(('name', 'title'))
+    if track_title is None or page_title is None:
+        return None
+    return bandcamp_track_info_from_meta(track_title, page_title)
+
+def scrape_bandcamp_track_info(link, fast=False):
+    # Bandcamp has no public oEmbed endpoint, the fast mode reads the page head only
+    return fetch_cached_track_info(link, parse_bandcamp_track_info, parse_head=parse_bandcamp_head, fast=fast)
+
+def process_bandcamp_links(links, verbose=False, fast=False):
     track_ids = []
-    for link in links:
-        if not "/track/" in link:
-            continue
-        title, artist = scrape_bandcamp_track_info(link)
-        if title or artist:
-            spotify_track_id = search_spotify_track(sp, query_title=title, query_artist=artist, min_similarity=0.7,
-                                                    verbose=verbose)
-            if spotify_track_id:
-                track_ids.append(spotify_track_id)
+    try:
+        for link in links:
+            if not "/track/" in link:
+                continue
+            with trace_span('link', cat='link', provider='bandcamp', url=link):
+                title, artist = scrape_bandcamp_track_info(link, fast=fast)
+                if title or artist:
+                    spotify_track_id = search_spotify_track(sp, query_title=title, query_artist=artist,
+                                                            min_similarity=0.7, verbose=verbose)
+                    if spotify_track_id:
+                        track_ids.append(spotify_track_id)
+    finally:  # keep what was scraped so far, even if a Spotify error or Ctrl-C stops the run
+        save_scrape_cache()
     return track_ids
 
 ### Soundcloud
-def scrape_soundcloud_track_info(link):
+def parse_soundcloud_track_info(html):
     try:
-        response = requests.get(link)
-        response.raise_for_status()  # Raise an error for bad responses (e.g., 404)
-        soup = BeautifulSoup(response.text, 'html.parser')
+        soup = BeautifulSoup(html, 'html.parser')
         # Try to extract from <meta> tags
         artist_tag = soup.find('meta', {'property': 'og:audio:artist'})
         if artist_tag:
@@ -327,24 +706,59 @@ def scrape_soundcloud_track_info(link):
                 track_title = full_title.split(" by ")[0].replace("Stream ", "").strip()
             else:
                 track_title = None
-        if clean_string(artist) in track_title.lower():
-            return track_title, None
-        else:
-            return track_title, artist
+        return soundcloud_track_info_from_meta(track_title, artist)
     except Exception as e:
         return None, None
 
-def process_soundcloud_links(links, verbose=False):
+def soundcloud_track_info_from_meta(track_title, artist):
+    if clean_string(artist) in track_title.lower():
+        return track_title, None
+    else:
+        return track_title, artist
+
+def parse_soundcloud_head(meta):
+    # Same fields as parse_soundcloud_track_info, minus the soundTitle__username <span> which lives in the body. It
+    # shows the same uploader name as twitter:audio:artist_name, so the head tags are used before falling back.
+    full_title = meta.get('title', '')
+    artist = meta.get(('property', 'og:audio:artist')) or meta.get(('name', 'twitter:audio:artist_name'))
+    if not artist and " by " in full_title:
+        artist = full_title.split(" by ")[1].split(" | ")[0].strip()
+    track_title = meta.get(('property', 'og:title'))
+    if not track_title and " by " in full_title:
+        track_title = full_title.split(" by ")[0].replace("Stream ", "").strip()
+    if not artist or not track_title:
+        return None
+    return soundcloud_track_info_from_meta(track_title, artist)
+
+def parse_soundcloud_oembed(data):
+    # oEmbed gives "<title> by <uploader>" and the uploader name, the same fields as og:title/og:audio:artist
+    track_title = data.get('title')
+    artist = data.get('author_name')
+    if not track_title or not artist:
+        return None
+    if track_title.endswith(f" by {artist}"):
+        track_title = track_title[:-len(f" by {artist}")]
+    return soundcloud_track_info_from_meta(track_title, artist)
+
+def scrape_soundcloud_track_info(link, fast=False):
+    return fetch_cached_track_info(link, parse_soundcloud_track_info, parse_head=parse_soundcloud_head,
+                                   oembed=('https://soundcloud.com/oembed', parse_soundcloud_oembed), fast=fast)
+
+def process_soundcloud_links(links, verbose=False, fast=False):
     track_ids = []
-    for link in links:
-        title, artist = scrape_soundcloud_track_info(link)
-        if title:
-            title = re.sub(r'((?:[^-]+ - ){2}).*', r'\1', title)
-        if title or artist:
-            spotify_track_id = search_spotify_track(sp, query_title=title, query_artist=artist, min_similarity=0.7,
-                                                    verbose=verbose)
-            if spotify_track_id:
-                track_ids.append(spotify_track_id)
+    try:
+        for link in links:
+            with trace_span('link', cat='link', provider='soundcloud', url=link):
+                title, artist = scrape_soundcloud_track_info(link, fast=fast)
+                if title:
+                    title = re.sub(r'((?:[^-]+ - ){2}).*', r'\1', title)
+                if title or artist:
+                    spotify_track_id = search_spotify_track(sp, query_title=title, query_artist=artist,
+                                                            min_similarity=0.7, verbose=verbose)
+                    if spotify_track_id:
+                        track_ids.append(spotify_track_id)
+    finally:  # keep what was scraped so far, even if a Spotify error or Ctrl-C stops the run
+        save_scrape_cache()
     return track_ids
 
 def process_discogs_csv_rows(discogs_csv_path, min_similarity=0.65):
@@ -369,46 +783,55 @@ def process_discogs_csv_rows(discogs_csv_path, min_similarity=0.65):
         label = clean_discogs_string(row[3])  # Column 4: Label name
         year = row[6].strip()
 
-        result_year = sp.search(q=f'artist:{artist} album:{album_name} label:{label} year:{year}', type="album", limit=1)
-        if result_year['albums']['items']:
-            query = f'{artist} {album_name} {year}'
-            album = result_year['albums']['items'][0]
-            artists = " ".join([a["name"] for a in album["artists"]])
-            result_year = f'{artists} {album["name"]} {album["release_date"].split("-")[0]}'
-            sim_year = token_based_similarity(query, result_year, return_sim=True)
-            album_tracks_year = sp.album_tracks(album['id'])['items']
-
-        result = sp.search(q=f'artist:{artist} album:{album_name} label:{label}', type="album", limit=1)
-        if result['albums']['items']:
-            query = f'{artist} {album_name}'
-            album = result['albums']['items'][0]
-            artists = " ".join([a["name"] for a in album["artists"]])
-            result = f'{artists} {album["name"]}'
-            sim = token_based_similarity(query, result, return_sim=True)
-            album_tracks = sp.album_tracks(album['id'])['items']
-
-        if sim > min_similarity or sim_year > min_similarity:
-            if sim > sim_year:
-                track_ids.extend([track['id'] for track in album_tracks])
-            else:
-                track_ids.extend([track['id'] for track in album_tracks_year])
-        else:
-            free_search_sim = []
-            free_search_titles = {}
-            results_unfiltered = sp.search(q=f'{artist} {album_name}', type="album", limit=8)
-            if results_unfiltered['albums']['items']:
+        with trace_span('link', cat='link', provider='discogs', url=f'{artist} - {album_name}'):
+            search_query = f'artist:{artist} album:{album_name} label:{label} year:{year}'
+            with trace_span('spotify_search', query=search_query, type='album', limit=1):
+                result_year = sp.search(q=search_query, type="album", limit=1)
+            if result_year['albums']['items']:
+                query = f'{artist} {album_name} {year}'
+                album = result_year['albums']['items'][0]
+                artists = " ".join([a["name"] for a in album["artists"]])
+                result_year = f'{artists} {album["name"]} {album["release_date"].split("-")[0]}'
+                sim_year = token_based_similarity(query, result_year, return_sim=True)
+                with trace_span('spotify_album_tracks', album_id=album['id']):
+                    album_tracks_year = sp.album_tracks(album['id'])['items']
+
+            search_query = f'artist:{artist} album:{album_name} label:{label}'
+            with trace_span('spotify_search', query=search_query, type='album', limit=1):
+                result = sp.search(q=search_query, type="album", limit=1)
+            if result['albums']['items']:
                 query = f'{artist} {album_name}'
-                for i, album in enumerate(results_unfiltered['albums']['items']):
-                    artists = " ".join([a["name"] for a in album["artists"]])
-                    result = f'{artists} {album["name"]}'
-                    sim = token_based_similarity(query, result, return_sim=True)
-                    free_search_sim.append(sim)
-                    free_search_titles[i] = sp.album_tracks(album['id'])['items']
-                    if sim < 0.3 or sim == 1:
-                        break
-                sim_argmax = np.argmax(free_search_sim)
-                if free_search_sim[sim_argmax] > min_similarity:
-                    track_ids.extend([track['id'] for track in free_search_titles[sim_argmax]])
+                album = result['albums']['items'][0]
+                artists = " ".join([a["name"] for a in album["artists"]])
+                result = f'{artists} {album["name"]}'
+                sim = token_based_similarity(query, result, return_sim=True)
+                with trace_span('spotify_album_tracks', album_id=album['id']):
+                    album_tracks = sp.album_tracks(album['id'])['items']
+
+            if sim > min_similarity or sim_year > min_similarity:
+                if sim > sim_year:
+                    track_ids.extend([track['id'] for track in album_tracks])
+                else:
+                    track_ids.extend([track['id'] for track in album_tracks_year])
+            else:
+                free_search_sim = []
+                free_search_titles = {}
+                with trace_span('spotify_search', query=f'{artist} {album_name}', type='album', limit=8):
+                    results_unfiltered = sp.search(q=f'{artist} {album_name}', type="album", limit=8)
+                if results_unfiltered['albums']['items']:
+                    query = f'{artist} {album_name}'
+                    for i, album in enumerate(results_unfiltered['albums']['items']):
+                        artists = " ".join([a["name"] for a in album["artists"]])
+                        result = f'{artists} {album["name"]}'
+                        sim = token_based_similarity(query, result, return_sim=True)
+                        free_search_sim.append(sim)
+                        with trace_span('spotify_album_tracks', album_id=album['id'], candidate=i):
+                            free_search_titles[i] = sp.album_tracks(album['id'])['items']
+                        if sim < 0.3 or sim == 1:
+                            break
+                    sim_argmax = np.argmax(free_search_sim)
+                    if free_search_sim[sim_argmax] > min_similarity:
+                        track_ids.extend([track['id'] for track in free_search_titles[sim_argmax]])
     return track_ids
 ########################################################################################################################
 
@@ -511,7 +934,9 @@ def search_spotify_track(sp, query_title, query_artist=None, min_similarity=0.65
     search_query = f"artist:{query_artist} track:{query_title}" if query_artist else clean_query
 
     # Initial search
-    result = sp.search(q=search_query, type='track', limit=1)
+    with trace_span('spotify_search', query=search_query, type='track', limit=1) as span:
+        result = sp.search(q=search_query, type='track', limit=1)
+        span['results'] = len(result['tracks']['items'])
     if not result['tracks']['items']:
         if query_artist:  # try w/o artist(s) because title might contain artist(s)
             return search_spotify_track(sp, query_title, min_similarity=min_similarity, verbose=verbose)
@@ -519,7 +944,8 @@ def search_spotify_track(sp, query_title, query_artist=None, min_similarity=0.65
             sim1 = 0.0
     else:
         track1 = result['tracks']['items'][0]
-        sim1 = get_similarity(clean_query, track1)
+        with trace_span('similarity', query=clean_query, candidates=1):
+            sim1 = get_similarity(clean_query, track1)
         res1 = f'{" ".join([a["name"] for a in track1["artists"] if a["name"] not in track1["name"]])} - {track1["name"]}'
         if sim1 >= 0.9:
             if verbose:
@@ -527,13 +953,16 @@ def search_spotify_track(sp, query_title, query_artist=None, min_similarity=0.65
             return track1['id']
 
     # Extended search if the first track's similarity isn't high enough
-    results_unfiltered = sp.search(q=search_query, type='track', limit=6)
+    with trace_span('spotify_search', query=search_query, type='track', limit=6) as span:
+        results_unfiltered = sp.search(q=search_query, type='track', limit=6)
+        span['results'] = len(results_unfiltered['tracks']['items'])
     if not results_unfiltered['tracks']['items']:
         if verbose:
             print("---> resulted in: None (no matches found)")
         return None
     else:
-        best_track_id = process_results(clean_query, results_unfiltered, ini_track_id=track1['id'])
+        with trace_span('similarity', query=clean_query, candidates=len(results_unfiltered['tracks']['items'])):
+            best_track_id = process_results(clean_query, results_unfiltered, ini_track_id=track1['id'])
 
         if verbose and best_track_id is None:
             if sim1 >= min_similarity:
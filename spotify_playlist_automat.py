@@ -9,7 +9,9 @@ from functionalities import (process_html_files, load_links_from_json, create_or
                              add_tracks_to_playlist, extract_youtube_video_ids, get_video_titles_from_youtube,
                              process_shazam_links, process_bandcamp_links, process_soundcloud_links, search_spotify_track,
                              get_playlist_info, collect_all_tracks_from_playlists, check_for_duplicates_in_playlist,
-                             process_discogs_csv_rows, delete_all_playlist_tracks)
+                             process_discogs_csv_rows, delete_all_playlist_tracks, load_scrape_cache,
+                             load_duplicate_index, enable_tracing, trace_span, export_trace, print_slowest_links,
+                             start_cpu_profile, stop_cpu_profile)
 
 
 parser = argparse.ArgumentParser(description='Spotify Playlist Automat (SPA)')
@@ -26,21 +28,45 @@ parser.add_argument('--print_playlist_info', action="store_true", help='prints m
 parser.add_argument('--playlist_url', default='https://open.spotify.com/playlist/<YOUR_PLAYLIST_ID>', type=str, help='playlist link')
 parser.add_argument('--pers_pl_name_pref', default='', type=str, help='Personalized prefix for playlist name')
 parser.add_argument('--discogs_csv_path', default='', type=str, help='Path to Discogs-exported csv file')
+parser.add_argument('--scrape_cache_path', default='./.scrape_cache.json', type=str, help='Cache file for scraped Bandcamp/SoundCloud metadata (empty string disables persistence)')
+parser.add_argument('--scrape_cache_max_age', default=168, type=float, help='Hours before a cached page is revalidated with a conditional request')
+parser.add_argument('--fast_scrape', action="store_true", help='Read only the page head (or oEmbed) of scraped links, full page as fallback')
+parser.add_argument('--duplicate_index_path', default='./.duplicate_index.json', type=str, help='ISRC/artist-title index used to skip near-duplicate tracks (empty string disables persistence)')
 parser.add_argument("--delete_all_tracks", action="store_true", help='Deletes all tracks from a playlist')
+parser.add_argument("--profile", action="store_true", help='Trace per-link stage latencies and print the slowest links')
+parser.add_argument('--profile_path', default='./spa_trace.json', type=str, help='Chrome-trace/Perfetto JSON output of --profile')
+parser.add_argument('--profile_top', default=10, type=int, help='Number of slowest links printed by --profile')
+parser.add_argument("--profile_cpu", action="store_true", help='Additionally capture a cProfile of CPU time (written next to --profile_path)')
 parser.add_argument("--verbose", action="store_true", help='Stdout process information.')
 parser.add_argument("--test_run", action="store_true", help='Only tests for new search results but does not add them.')
 print("###########################################################################################")
 
 def main():
     args = parser.parse_args()
+    if args.profile:
+        enable_tracing()
+    profiler = start_cpu_profile() if args.profile_cpu else None
+    try:
+        run(args)
+    finally:
+        if profiler:
+            stop_cpu_profile(profiler, os.path.splitext(args.profile_path)[0] + '.prof')
+        if args.profile:
+            export_trace(args.profile_path)
+            print_slowest_links(args.profile_top)
+
+def run(args):
     json_file_path = f"{args.tg_chat_export_path}/categorized_links.json"
     user_id = sp.current_user()['id']
     pl_prefix = args.pers_pl_name_pref + '_' if args.pers_pl_name_pref else ''
+    load_scrape_cache(args.scrape_cache_path, max_age_hours=args.scrape_cache_max_age)
+    load_duplicate_index(args.duplicate_index_path)
 
     if args.extract_new_links:
         html_files = glob.glob(os.path.join(args.tg_chat_export_path, "*.html"))
         html_files.sort(key=lambda x: os.path.basename(x))
-        categorized_links = process_html_files(html_files)
+        with trace_span('ingest', files=len(html_files)):
+            categorized_links = process_html_files(html_files)
         with open(json_file_path, 'w', encoding='utf-8') as json_file:
             json.dump(categorized_links, json_file, indent=4)
 
@@ -65,9 +91,10 @@ def main():
 
             youtube_track_ids = []
             for video_id, title in video_titles.items():
-                spotify_track_id = search_spotify_track(sp, title, min_similarity=0.65, verbose=args.verbose)
-                if spotify_track_id:
-                    youtube_track_ids.append(spotify_track_id)
+                with trace_span('link', cat='link', provider='youtube', url=f'https://youtu.be/{video_id}'):
+                    spotify_track_id = search_spotify_track(sp, title, min_similarity=0.65, verbose=args.verbose)
+                    if spotify_track_id:
+                        youtube_track_ids.append(spotify_track_id)
             unique_track_ids = list(dict.fromkeys(youtube_track_ids))
             add_tracks_to_playlist(sp, playlist_id, unique_track_ids, testrun=args.test_run)
 
@@ -87,7 +114,7 @@ def main():
             delete_all_playlist_tracks(sp, playlist_id)
         else:
             bandcamp_urls = load_links_from_json(json_file_path, category='bandcamp')
-            bc_track_ids = process_bandcamp_links(bandcamp_urls, verbose=args.verbose)
+            bc_track_ids = process_bandcamp_links(bandcamp_urls, verbose=args.verbose, fast=args.fast_scrape)
             unique_track_ids = list(dict.fromkeys(bc_track_ids))
             add_tracks_to_playlist(sp, playlist_id, unique_track_ids, testrun=args.test_run)
 
@@ -97,7 +124,8 @@ def main():
             delete_all_playlist_tracks(sp, playlist_id)
         else:
             soundcloud_urls = load_links_from_json(json_file_path, category='soundcloud')
-            soundcloud_track_ids = process_soundcloud_links(soundcloud_urls, verbose=args.verbose)
+            soundcloud_track_ids = process_soundcloud_links(soundcloud_urls, verbose=args.verbose,
+                                                            fast=args.fast_scrape)
             unique_track_ids = list(dict.fromkeys(soundcloud_track_ids))
             add_tracks_to_playlist(sp, playlist_id, unique_track_ids, testrun=args.test_run)
 
@@ -116,7 +144,8 @@ def main():
             all_track_ids = collect_all_tracks_from_playlists(sp, user_id, playlist_names)
             all_unique_track_ids = list(dict.fromkeys(all_track_ids))
             # random.shuffle(all_unique_track_ids)
-            add_tracks_to_playlist(sp, playlist_id, all_unique_track_ids, testrun=args.test_run)
+            add_tracks_to_playlist(sp, playlist_id, all_unique_track_ids, testrun=args.test_run,
+                                   skip_near_duplicates=True)
             check_for_duplicates_in_playlist(sp, playlist_id)
 
     if args.discogs_csv_path: